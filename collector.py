@@ -2,61 +2,170 @@ from __future__ import annotations
 
 """pykrx 기반 투자자별 수급 데이터 수집 모듈."""
 
+import json
+import os
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    TimeoutError as FuturesTimeout,
+    as_completed,
+)
 from datetime import datetime
 
 import pandas as pd
 import requests as _requests
+from requests.adapters import HTTPAdapter
 
 pd.set_option("future.no_silent_downcasting", True)
 
-# ── pykrx 내부 requests에 기본 타임아웃 설정 (무한 대기 방지) ──
-_original_request = _requests.Session.request
+# ── pykrx 내부 requests에 기본 타임아웃 + 연결 풀링 적용 ──
+# requests.get/post 같은 세션 없는 단발 호출은 건마다 일회성 연결을 쓰므로
+# KRX 요청만 모듈 공용 세션으로 수렴시켜 TLS 핸드셰이크를 재사용한다.
+# 재라우팅은 requests.api 계층에서만 한다 — 자체 Session을 가진 호출자
+# (krx_auth의 인증 세션, pykrx의 KRXSession)는 쿠키/헤더 같은 세션 상태가
+# 그대로 전송돼야 하므로 건드리지 않고, 풀링도 각 세션이 스스로 한다.
+# 재임포트(Streamlit 소스 리로드) 시 패치 위에 패치가 쌓여 재귀하지 않도록
+# __wrapped__로 원본을 되짚어 잡는다
+_original_request = getattr(
+    _requests.Session.request, "__wrapped__", _requests.Session.request
+)
+_original_api_request = getattr(
+    _requests.api.request, "__wrapped__", _requests.api.request
+)
+
+_KRX_HOSTS = ("data.krx.co.kr", "www.krx.co.kr")
+_SESSION = _requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16, pool_maxsize=16, max_retries=0
+))
+
+
+def _patched_request(self, method, url, *args, **kwargs):
+    # 모든 세션에 기본 타임아웃만 주입 (무기한 대기 방지)
+    kwargs.setdefault("timeout", 15)
+    return _original_request(self, method, url, *args, **kwargs)
 
 
-def _patched_request(self, *args, **kwargs):
-    kwargs.setdefault("timeout", 15)
-    return _original_request(self, *args, **kwargs)
+def _patched_api_request(method, url, **kwargs):
+    # 세션 없는 KRX 호출만 공용 세션으로 (requests.get/post는 이 함수 경유)
+    if any(host in str(url) for host in _KRX_HOSTS):
+        return _SESSION.request(method, url, **kwargs)
+    return _original_api_request(method, url, **kwargs)
 
 
+_patched_request.__wrapped__ = _original_request
+_patched_api_request.__wrapped__ = _original_api_request
 _requests.Session.request = _patched_request
+_requests.api.request = _patched_api_request
+_requests.request = _patched_api_request
 
 import config  # noqa: E402  — dotenv 로드를 위해 먼저 임포트
 import krx_auth  # noqa: E402
 krx_auth.init()
 
 from pykrx import stock  # noqa: E402
+from pykrx.website import krx as _krx  # noqa: E402  — 상장 목록 일괄 조회용
+
+
+# 거래일 프로브 결과 디스크 캐시 — Streamlit Cloud가 컨테이너를 재활용해도
+# 이미 확인한 날짜는 콜드 스타트에서 프로브 없이 즉시 판별한다.
+_TRADING_DAYS_PATH = os.path.join(config.DATA_DIR, "trading_days.json")
+_trading_days: dict[str, bool] | None = None
+
+
+def _load_trading_days() -> dict[str, bool]:
+    global _trading_days
+    if _trading_days is None:
+        try:
+            with open(_TRADING_DAYS_PATH, encoding="utf-8") as f:
+                _trading_days = {k: bool(v) for k, v in json.load(f).items()}
+        except (OSError, ValueError):
+            _trading_days = {}
+    return _trading_days
+
+
+def _save_trading_day(date_str: str):
+    """거래일로 확인된 날짜를 디스크 캐시에 기록 (임시 파일 + rename 교체).
+
+    True만 영구화한다 — 프로브는 소프트 실패라(인증 차단/깨진 응답도
+    빈 DataFrame으로 돌아옴) False는 휴장일과 구분할 수 없고, 디스크에
+    남기면 무효화 경로가 없다.
+    """
+    cache = _load_trading_days()
+    cache[date_str] = True
+    try:
+        os.makedirs(config.DATA_DIR, exist_ok=True)
+        tmp = _TRADING_DAYS_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp, _TRADING_DAYS_PATH)
+    except OSError:
+        pass
+
+
+# 프로브 결과 메모리 캐시 — lru_cache 대신 직접 관리해, 기록하면 안 되는
+# 판정(당일 장 시작 전의 False, 타임아웃 시의 낙관적 True)을 걸러낸다
+_trading_day_memo: dict[str, bool] = {}
 
 
 def _is_likely_trading_day(date_str: str) -> bool:
-    """간단한 거래일 판별 (주말 제외 + KRX 빠른 체크).
+    """간단한 거래일 판별 (주말/휴장일 제외 + KRX 빠른 체크).
 
     완벽하지 않지만 주말/공휴일에 28번 API 호출하는 것을 방지.
+    결과는 메모리와 디스크(trading_days.json)에 캐시된다. 당일의 False는
+    장 시작 전 프로브가 비어 나온 것일 수 있어 어느 층에도 고정하지
+    않는다 — 다음 호출에서 재프로브한다.
     """
+    cached = _trading_day_memo.get(date_str)
+    if cached is not None:
+        return cached
     try:
         dt = datetime.strptime(date_str, "%Y%m%d")
         if dt.weekday() >= 5:  # 토/일
+            _trading_day_memo[date_str] = False
+            return False
+        if date_str in config.KRX_HOLIDAYS:
+            _trading_day_memo[date_str] = False
             return False
-        # pykrx로 빠른 체크: OHLCV가 있으면 거래일
+        # 디스크 캐시는 True만 신뢰 — 구버전이 남긴 False 항목은 인증 차단
+        # 등 소프트 실패였을 수 있으므로 무시하고 재프로브한다
+        if _load_trading_days().get(date_str):
+            _trading_day_memo[date_str] = True
+            return True
+        # 달력으로 확정 못 한 평일만 pykrx로 빠른 체크: OHLCV가 있으면 거래일
         with ThreadPoolExecutor(max_workers=1) as pool:
             future = pool.submit(
                 stock.get_market_ohlcv_by_ticker, date_str, market="KOSPI"
             )
             result = future.result(timeout=10)
-            return not result.empty
+        is_trading = not result.empty
+        if is_trading:
+            _save_trading_day(date_str)
+        # False 메모이즈는 과거 날짜만, 프로세스 수명 동안만 —
+        # 당일은 장 시작 전 프로브가 비어 나올 수 있어 재프로브한다
+        if is_trading or date_str < datetime.now().strftime("%Y%m%d"):
+            _trading_day_memo[date_str] = is_trading
+        return is_trading
     except (FuturesTimeout, Exception):
-        # 타임아웃이면 일단 거래일로 간주 (본 수집에서 개별 타임아웃 처리)
+        # 타임아웃이면 일단 거래일로 간주 (본 수집에서 개별 타임아웃 처리,
+        # 캐시에는 남기지 않아 다음 호출에서 다시 판별)
         return True
 
 
+# 동시 API 호출 상한 (KRX 부하 제어 — 고정 딜레이 대신 세마포어로 제한)
+MAX_CONCURRENT_REQUESTS = 8
+_request_semaphore = threading.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+
 def _retry(func, *args, max_retries=config.MAX_RETRIES, timeout=20, **kwargs):
     """API 호출 재시도 래퍼 (타임아웃 포함)."""
     for attempt in range(max_retries):
         try:
-            with ThreadPoolExecutor(max_workers=1) as pool:
-                future = pool.submit(func, *args, **kwargs)
-                return future.result(timeout=timeout)
+            with _request_semaphore:
+                with ThreadPoolExecutor(max_workers=1) as pool:
+                    future = pool.submit(func, *args, **kwargs)
+                    return future.result(timeout=timeout)
         except FuturesTimeout:
             print(f"[Collector] 타임아웃 ({timeout}s): {func.__name__}")
             if attempt == max_retries - 1:
@@ -67,6 +176,12 @@ def _retry(func, *args, max_retries=config.MAX_RETRIES, timeout=20, **kwargs):
                 print(f"[Collector] 최종 실패: {func.__name__}{args} — {e}")
                 return pd.DataFrame()
             wait = config.RETRY_BASE_DELAY * (2 ** attempt)
+            # 429(rate limit)면 서버가 알려준 Retry-After를 우선 존중
+            resp = getattr(e, "response", None)
+            if resp is not None and getattr(resp, "status_code", None) == 429:
+                retry_after = str(resp.headers.get("Retry-After", ""))
+                if retry_after.isdigit():
+                    wait = max(wait, float(retry_after))
             print(f"[Collector] 재시도 {attempt + 1}/{max_retries}: {e} ({wait:.1f}s 대기)")
             time.sleep(wait)
     return pd.DataFrame()
@@ -89,93 +204,141 @@ def collect(date: str, progress_callback=None) -> pd.DataFrame:
 
     total_steps = len(config.MARKETS) * (len(config.INVESTORS) + 2)
     current_step = 0
+    last_push = 0.0
 
     def _progress(msg):
-        nonlocal current_step
+        nonlocal current_step, last_push
         current_step += 1
-        ratio = current_step / total_steps
         if progress_callback:
-            progress_callback(ratio, msg)
+            # 콜백은 Streamlit 리렌더를 유발하므로 0.2초 간격으로만 푸시
+            # (마지막 스텝은 항상 전달해 진행률 100%를 보장)
+            now = time.monotonic()
+            if now - last_push >= 0.2 or current_step == total_steps:
+                progress_callback(current_step / total_steps, msg)
+                last_push = now
         else:
             print(f"[Collector] ({current_step}/{total_steps}) {msg}")
 
+    # ── 수집 단계: 시장×(시가총액/등락률/투자자별) 요청을 병렬 제출 ──
+    # 호출은 전부 I/O 대기라 스레드 병렬화로 대기 시간을 겹치고,
+    # 동시성 상한은 _retry의 세마포어가 담당한다.
+    results: dict[tuple[str, str], pd.DataFrame] = {}
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+        futures = {}
+        for market in config.MARKETS:
+            futures[executor.submit(
+                _retry, stock.get_market_cap_by_ticker, date, market=market
+            )] = (market, "시가총액")
+            futures[executor.submit(
+                _retry, stock.get_market_ohlcv_by_ticker, date, market=market
+            )] = (market, "등락률")
+            for inv in config.INVESTORS:
+                futures[executor.submit(
+                    _retry, stock.get_market_net_purchases_of_equities,
+                    date, date, market, inv,
+                )] = (market, inv)
+
+        for future in as_completed(futures):
+            market, kind = futures[future]
+            results[(market, kind)] = future.result()
+            if kind in ("시가총액", "등락률"):
+                _progress(f"{market} {kind} 데이터 수집")
+            else:
+                _progress(f"{market} {kind} 순매수 수집")
+
+    # ── 조합 단계: 단일 스레드로 DataFrame 구성 ──
     all_data = []
 
     for market in config.MARKETS:
-        # 1) 시가총액 데이터 (종가, 시가총액, 거래량, 거래대금, 상장주식수)
-        _progress(f"{market} 시가총액 데이터 수집")
-        cap_df = _retry(stock.get_market_cap_by_ticker, date, market=market)
-        time.sleep(config.REQUEST_DELAY)
-
-        # 2) OHLCV 데이터 (등락률)
-        _progress(f"{market} 등락률 데이터 수집")
-        ohlcv_df = _retry(stock.get_market_ohlcv_by_ticker, date, market=market)
-        time.sleep(config.REQUEST_DELAY)
+        cap_df = results[(market, "시가총액")]
+        ohlcv_df = results[(market, "등락률")]
 
         if cap_df.empty or ohlcv_df.empty:
-            for inv in config.INVESTORS:
-                _progress(f"{market} {inv} — 기초 데이터 없어 스킵")
+            print(f"[Collector] {market} 기초 데이터 없어 스킵")
             continue
 
         # 기본 종목 정보 조합 (cap_df 기준 인덱스 = 티커)
-        base_df = pd.DataFrame(index=cap_df.index)
-        base_df["시장"] = market
-        base_df["종가"] = cap_df.iloc[:, 0]       # 종가
-        base_df["시가총액"] = cap_df.iloc[:, 1]    # 시가총액
-        base_df["거래량"] = cap_df.iloc[:, 2]      # 거래량
-        base_df["거래대금"] = cap_df.iloc[:, 3]    # 거래대금
-
-        # 상장주식수 (회전율 계산용)
-        listed_shares = cap_df.iloc[:, 4]          # 상장주식수
+        # 컬럼을 dict에 모아 DataFrame을 한 번에 생성 — 반복 __setitem__이
+        # 유발하는 BlockManager 분할/통합을 피한다.
 
         # 등락률 (ohlcv 7번째 컬럼 = 등락률, 인덱스 6)
-        base_df["등락률"] = ohlcv_df.iloc[:, 6].reindex(base_df.index).fillna(0.0)
-
-        # 회전율 = 거래량 / 상장주식수 * 100
-        base_df["회전율"] = (base_df["거래량"] / listed_shares * 100).round(4)
-        base_df["회전율"] = base_df["회전율"].fillna(0)
+        # 인덱스가 이미 일치하면 해시 조인(reindex) 생략
+        change_col = ohlcv_df.iloc[:, 6]
+        if not change_col.index.equals(cap_df.index):
+            change_col = change_col.reindex(cap_df.index)
+        if change_col.hasnans:
+            change_col = change_col.fillna(0.0)
+
+        volume = cap_df.iloc[:, 2]                 # 거래량
+        listed_shares = cap_df.iloc[:, 4]          # 상장주식수 (회전율 계산용)
+
+        cols = {
+            "시장": market,
+            "종가": cap_df.iloc[:, 0],
+            "시가총액": cap_df.iloc[:, 1],
+            "거래량": volume,
+            "거래대금": cap_df.iloc[:, 3],
+            "등락률": change_col,
+            # 회전율 = 거래량 / 상장주식수 * 100
+            "회전율": (volume / listed_shares * 100).round(4).fillna(0),
+        }
 
         # 종목명 수집용 dict
         name_map = {}
 
         # 3) 투자자별 순매수 데이터
         for inv in config.INVESTORS:
-            _progress(f"{market} {inv} 순매수 수집")
-            net_df = _retry(
-                stock.get_market_net_purchases_of_equities,
-                date, date, market, inv,
-            )
-            time.sleep(config.REQUEST_DELAY)
+            net_df = results[(market, inv)]
 
             if net_df.empty:
-                base_df[inv] = 0
+                cols[inv] = 0
                 continue
 
-            # 첫 번째 투자자 결과에서 종목명 수집 (net_df 첫 컬럼 = 종목명)
-            if not name_map:
-                for ticker in net_df.index:
-                    name_map[ticker] = net_df.iloc[:, 0].get(ticker, "")
+            # 모든 투자자 결과에서 종목명 수집 (net_df 첫 컬럼 = 종목명)
+            name_map.update(zip(net_df.index, net_df.iloc[:, 0].to_numpy()))
 
             # 순매수거래대금 = 마지막 컬럼 (순매수거래대금)
             net_col = net_df.iloc[:, -1]
-            base_df[inv] = net_col.reindex(base_df.index).fillna(0).astype("int64", errors="ignore")
-
-        # 종목명 매핑
-        base_df["종목명"] = base_df.index.map(lambda t: name_map.get(t, ""))
-        # 종목명이 비어있는 경우 pykrx 개별 조회 (최대 50개로 제한)
-        missing = base_df[base_df["종목명"] == ""].index[:50]
-        for ticker in missing:
-            try:
-                name = stock.get_market_ticker_name(ticker)
-                if name:
-                    base_df.at[ticker, "종목명"] = name
-            except Exception:
-                pass
+            if not net_col.index.equals(cap_df.index):
+                net_col = net_col.reindex(cap_df.index)
+            if net_col.hasnans:
+                net_col = net_col.fillna(0)
+            cols[inv] = net_col.astype("int64", errors="ignore")
+
+        # 종목명 매핑 (C 레벨 해시 조인 — 티커별 파이썬 람다 호출 방지)
+        cols["종목명"] = (
+            pd.Series(name_map, dtype=object)
+            .reindex(cap_df.index)
+            .fillna("")
+            .astype(str)
+        )
+
+        base_df = pd.DataFrame(cols, index=cap_df.index)
+        # 종목명이 비어있는 경우 상장 목록 1회 조회로 일괄 보완
+        # (종목별 개별 조회는 건당 HTTP 요청이라 누락 수에 비례해 느려짐)
+        missing = base_df.index[base_df["종목명"] == ""]
+        if len(missing) > 0:
+            listing = _retry(_krx.get_market_ticker_and_name, date, market)
+            if not listing.empty:
+                base_df.loc[missing, "종목명"] = (
+                    listing.reindex(missing).fillna("").astype(str)
+                )
+
+        # 거래량 0인 종목 제거 (비활성 종목) — concat 전에 걸러 복사량 절감
+        base_df = base_df[base_df["거래량"] > 0]
 
         # 인덱스(티커)를 컬럼으로
         base_df = base_df.reset_index()
         base_df = base_df.rename(columns={base_df.columns[0]: "티커"})
 
+        # concat 전에 문자열 컬럼을 범주형/Arrow 문자열로 변환 — object 컬럼의
+        # 요소별 refcount 복사를 피하고 이후 시장 필터/조회도 빨라진다
+        # (시장은 공통 카테고리 dtype이어야 concat 후에도 범주형 유지)
+        base_df["시장"] = base_df["시장"].astype(
+            pd.CategoricalDtype(config.MARKETS)
+        )
+        base_df["종목명"] = base_df["종목명"].astype("string[pyarrow]")
+
         all_data.append(base_df)
 
     if not all_data:
@@ -184,9 +347,6 @@ def collect(date: str, progress_callback=None) -> pd.DataFrame:
 
     result = pd.concat(all_data, ignore_index=True)
 
-    # 거래량 0인 종목 제거 (비활성 종목)
-    result = result[result["거래량"] > 0].reset_index(drop=True)
-
     # 컬럼 순서 정리
     ordered = [c for c in config.COLUMN_ORDER if c in result.columns]
     extra = [c for c in result.columns if c not in ordered]
@@ -37,8 +37,42 @@ INVESTORS = [
 # 주요 투자자 (대시보드 요약용)
 MAJOR_INVESTORS = ["개인", "외국인", "기관합계"]
 
-# API 호출 딜레이 (초)
-REQUEST_DELAY = 0.2
+# KRX 휴장일 (주말 제외 — 설/추석 연휴, 대체공휴일, 연말 휴장 포함)
+# 정적 달력이라 완벽하지 않음: 누락된 날짜는 수집 시 KRX 프로브가 걸러낸다.
+KRX_HOLIDAYS = frozenset({
+    # 2025
+    "20250101",  # 신정
+    "20250127", "20250128", "20250129", "20250130",  # 설 연휴 (+임시공휴일)
+    "20250303",  # 삼일절 대체공휴일
+    "20250501",  # 근로자의 날
+    "20250505", "20250506",  # 어린이날·부처님오신날 (+대체공휴일)
+    "20250603",  # 대통령 선거일
+    "20250606",  # 현충일
+    "20250815",  # 광복절
+    "20251003",  # 개천절
+    "20251006", "20251007", "20251008",  # 추석 연휴 (+대체공휴일)
+    "20251009",  # 한글날
+    "20251225",  # 성탄절
+    "20251231",  # 연말 휴장
+    # 2026
+    "20260101",  # 신정
+    "20260216", "20260217", "20260218",  # 설 연휴
+    "20260302",  # 삼일절 대체공휴일
+    "20260501",  # 근로자의 날
+    "20260505",  # 어린이날
+    "20260525",  # 부처님오신날 대체공휴일
+    "20260603",  # 지방선거일
+    "20260817",  # 광복절 대체공휴일
+    "20260924", "20260925", "20260928",  # 추석 연휴 (+대체공휴일)
+    "20261005",  # 개천절 대체공휴일
+    "20261009",  # 한글날
+    "20261225",  # 성탄절
+    "20261231",  # 연말 휴장
+})
+
+# API 호출 딜레이 (초) — 고정 딜레이 대신 동시성 제한 + 재시도 백오프를
+# 사용하므로 0. 하위 호환을 위해 상수 자체는 유지.
+REQUEST_DELAY = 0
 
 # 재시도 설정
 MAX_RETRIES = 2
@@ -3,6 +3,7 @@
 import os
 from datetime import datetime, timedelta
 
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -17,29 +18,77 @@ st.title("📊 국내 주식 투자자별 수급 현황")
 
 # ── 데이터 로딩 ─────────────────────────────────────────────
 
-def _load_from_excel(date_str: str) -> pd.DataFrame:
-    """로컬 엑셀 파일에서 데이터 로드."""
-    path = os.path.join(config.DATA_DIR, f"수급_{date_str}.xlsx")
-    if not os.path.exists(path):
-        return pd.DataFrame()
+try:
+    import python_calamine  # noqa: F401  — Rust 기반 xlsx 리더 (openpyxl보다 수 배 빠름)
+    _EXCEL_ENGINE = "calamine"
+except ImportError:
+    _EXCEL_ENGINE = "openpyxl"
+
+
+@st.cache_data(ttl=3600)
+def _load_from_local(path: str, mtime: float) -> pd.DataFrame:
+    """로컬 저장본(Parquet 스냅샷 또는 엑셀) 로드.
+
+    경로와 mtime이 캐시 키 — 파일이 재생성되면 캐시가 무효화된다.
+    """
+    if path.endswith(".parquet"):
+        try:
+            return pd.read_parquet(path)
+        except Exception:
+            return pd.DataFrame()
     try:
-        df = pd.read_excel(path, sheet_name="전체", header=1)
-        return df
+        df = pd.read_excel(path, sheet_name="전체", header=1,
+                           engine=_EXCEL_ENGINE)
     except Exception:
         return pd.DataFrame()
+    # 엑셀의 금액 컬럼은 억원 단위(신형: 숫자, 구형: 콤마 문자열) →
+    # 내부 표준인 원 단위 숫자로 복원
+    money_cols = [c for c in df.columns
+                  if c in config.INVESTORS or c in ("시가총액", "거래대금")]
+    for col in money_cols:
+        s = df[col]
+        if s.dtype == object:
+            s = pd.to_numeric(s.astype(str).str.replace(",", "", regex=False),
+                              errors="coerce")
+        df[col] = s.fillna(0) * 1e8
+    return df
 
 
 @st.cache_data(ttl=3600, show_spinner="데이터 수집 중...")
 def _collect_live(date_str: str) -> pd.DataFrame:
-    """pykrx 실시간 수집 (Streamlit Cloud용)."""
-    return collector.collect(date_str)
+    """pykrx 실시간 수집 (Streamlit Cloud용).
+
+    성공 시 Parquet 스냅샷을 남겨 다음 로드는 xlsx 파싱 없이 즉시 읽는다.
+    """
+    df = collector.collect(date_str)
+    if not df.empty:
+        try:
+            os.makedirs(config.DATA_DIR, exist_ok=True)
+            df.to_parquet(
+                os.path.join(config.DATA_DIR, f"수급_{date_str}.parquet"),
+                compression="zstd", index=False,
+            )
+        except Exception:
+            pass
+    return df
 
 
 def load_data(date_str: str) -> pd.DataFrame:
-    """데이터 로드 (엑셀 우선, 없으면 실시간 수집)."""
-    df = _load_from_excel(date_str)
-    if not df.empty:
-        return df
+    """데이터 로드 (로컬 저장본 우선, 없으면 실시간 수집).
+
+    Parquet 스냅샷(장중 라이브 수집)과 xlsx(CLI 장마감 산출물)가 둘 다
+    있으면 mtime이 최신인 쪽을 읽는다 — 스냅샷이 나중에 생성된 장마감
+    파일을 가리지 않도록.
+    """
+    candidates = []
+    for ext in ("parquet", "xlsx"):
+        path = os.path.join(config.DATA_DIR, f"수급_{date_str}.{ext}")
+        if os.path.exists(path):
+            candidates.append((os.path.getmtime(path), path))
+    for mtime, path in sorted(candidates, reverse=True):
+        df = _load_from_local(path, mtime)
+        if not df.empty:
+            return df
     return _collect_live(date_str)
 
 
@@ -84,14 +133,19 @@ if df.empty:
 if market_filter != "전체" and "시장" in df.columns:
     df = df[df["시장"] == market_filter]
 
-# 종목 검색
-if search_query:
-    mask = pd.Series(False, index=df.index)
-    if "종목명" in df.columns:
-        mask |= df["종목명"].str.contains(search_query, case=False, na=False)
-    if "티커" in df.columns:
-        mask |= df["티커"].str.contains(search_query, case=False, na=False)
-    df = df[mask]
+# 종목 검색 (regex=False → C 레벨 부분 문자열 검색, numpy OR로 중간 Series 생략)
+if search_query and ("종목명" in df.columns or "티커" in df.columns):
+    name_mask = (
+        df["종목명"].str.contains(search_query, case=False, na=False,
+                                regex=False).to_numpy()
+        if "종목명" in df.columns else False
+    )
+    tick_mask = (
+        df["티커"].str.contains(search_query, case=False, na=False,
+                               regex=False).to_numpy()
+        if "티커" in df.columns else False
+    )
+    df = df[name_mask | tick_mask]
 
 if df.empty:
     st.info("검색 결과가 없습니다.")
@@ -107,29 +161,48 @@ def format_억(value):
     return f"{round(float(value) / 1e8):,}억"
 
 
-def format_comma(value):
-    """숫자에 3자리 콤마 추가."""
-    if pd.isna(value):
-        return ""
-    if isinstance(value, float) and value == int(value):
-        return f"{int(value):,}"
-    if isinstance(value, (int, float)):
-        return f"{value:,}"
-    return str(value)
+def top_k_index(s: pd.Series, k: int, largest: bool = True) -> pd.Index:
+    """상위/하위 k개 인덱스 반환 (argpartition — 전체 정렬 없이 O(N))."""
+    arr = s.to_numpy()
+    k = min(k, len(arr))
+    if k == 0:
+        return s.index[:0]
+    order = -arr if largest else arr
+    part = np.argpartition(order, k - 1)[:k]
+    part = part[np.argsort(order[part])]
+    return s.index[part]
+
+
+# 변환 결과 메모 — 스크립트가 rerun마다 재실행되므로 렌더 단위로 초기화됨
+_num_cache: dict[str, pd.Series] = {}
 
 
 def to_numeric_investor(df, col):
-    """투자자 컬럼을 숫자로 변환 (원 단위 반환)."""
+    """투자자 컬럼을 숫자로 변환 (원 단위 반환, 렌더 내 메모이즈)."""
+    cached = _num_cache.get(col)
+    if cached is not None:
+        return cached
     if col not in df.columns:
         return pd.Series(0, index=df.index)
     s = df[col]
     if s.dtype in ("float64", "int64"):
+        _num_cache[col] = s
         return s
     # 엑셀에서 읽은 경우: 억원 단위 콤마 문자열 → 콤마 제거 → 억 → 원으로 복원
+    # regex=False라 C 레벨 str.replace로 디스패치됨
     numeric = pd.to_numeric(
-        s.astype(str).str.replace(",", ""), errors="coerce"
-    ).fillna(0)
-    return numeric * 1e8
+        s.astype(str).str.replace(",", "", regex=False),
+        errors="coerce", downcast="integer",
+    ).fillna(0) * 1e8
+    _num_cache[col] = numeric
+    return numeric
+
+
+# 이후 섹션들이 재사용하도록 표시 대상 투자자 컬럼을 미리 한 번만 변환
+for _inv in config.MAJOR_INVESTORS + [c for c in selected_investors
+                                      if c not in config.MAJOR_INVESTORS]:
+    if _inv in df.columns:
+        to_numeric_investor(df, _inv)
 
 
 # ── 1. 시장 요약 metrics ────────────────────────────────────
@@ -233,20 +306,21 @@ if selected_investors:
         others = [c for c in inv_cols if c not in major]
         inv_cols = major + others
 
-        heatmap_df = df.copy()
-        for col in inv_cols:
-            heatmap_df[col] = to_numeric_investor(heatmap_df, col)
-
-        heatmap_df["_total"] = heatmap_df[inv_cols].sum(axis=1)
-        top30 = heatmap_df.nlargest(30, "_total")
+        # 전체 df 복사 대신 필요한 투자자 컬럼만 숫자화한 서브 프레임 구성
+        heat_num = pd.DataFrame(
+            {col: to_numeric_investor(df, col) for col in inv_cols},
+            index=df.index,
+        )
+        top_idx = top_k_index(heat_num.sum(axis=1), 30)
+        top30 = heat_num.loc[top_idx]
 
-        if "종목명" in top30.columns:
-            labels = top30["종목명"].tolist()
+        if "종목명" in df.columns:
+            labels = df.loc[top_idx, "종목명"].tolist()
         else:
-            labels = top30["티커"].tolist()
+            labels = df.loc[top_idx, "티커"].tolist()
 
         # 억원 단위로 변환
-        heat_values_억 = top30[inv_cols].values / 1e8
+        heat_values_억 = top30.to_numpy() / 1e8
 
         # x축 라벨: 주요 투자자는 볼드
         x_labels = [
@@ -260,9 +334,9 @@ if selected_investors:
             y=labels,
             colorscale="RdBu",
             zmid=0,
-            text=[[f"{round(v):,}" for v in row] for row in heat_values_억],
-            texttemplate="%{text}",
-            hovertemplate="종목: %{y}<br>투자자: %{x}<br>순매수: %{text}억<extra></extra>",
+            # 셀 텍스트는 z값을 플롯리(d3)가 직접 포맷 — 파이썬 중첩 루프 제거
+            texttemplate="%{z:,.0f}",
+            hovertemplate="종목: %{y}<br>투자자: %{x}<br>순매수: %{z:,.0f}억<extra></extra>",
         ))
         fig_heat.update_layout(
             height=max(400, len(labels) * 25),
@@ -289,28 +363,39 @@ for tab, inv in zip(tabs, ranking_investors):
             st.info(f"{inv} 데이터 없음")
             continue
 
-        rank_df = df.copy()
-        rank_df[f"{inv}_num"] = to_numeric_investor(rank_df, inv)
+        # df 복사 없이 정렬 키만 한 번 계산해 상/하위 행을 뷰로 선택
+        key = to_numeric_investor(df, inv)
 
         show_cols = ["티커", "종목명", "시장", "종가", "등락률", inv]
-        show_cols = [c for c in show_cols if c in rank_df.columns]
+        show_cols = [c for c in show_cols if c in df.columns]
 
         def _fmt_ranking(sub_df):
-            out = sub_df[show_cols].reset_index(drop=True).copy()
-            if "종가" in out.columns:
-                out["종가"] = out["종가"].apply(format_comma)
+            # 문자열 변환 대신 숫자 유지 → 포맷은 column_config가 담당 (정렬 가능)
+            out = sub_df[show_cols].reset_index(drop=True)
             if inv in out.columns:
-                s = out[inv]
-                if s.dtype in ("float64", "int64"):
-                    out[inv] = s.apply(lambda v: f"{round(v / 1e8):,}" if pd.notna(v) else "")
+                out = out.assign(
+                    **{inv: (key.loc[sub_df.index] / 1e8).round().to_numpy()}
+                )
             return out
 
+        rank_col_config = {
+            inv: st.column_config.NumberColumn(f"{inv} (억)", format="%d"),
+        }
+        if "종가" in show_cols:
+            rank_col_config["종가"] = st.column_config.NumberColumn(
+                "종가", format="%d")
+        if "등락률" in show_cols:
+            rank_col_config["등락률"] = st.column_config.NumberColumn(
+                "등락률", format="%.2f%%")
+
         # TOP 매수
         st.markdown(f"**{inv} 순매수 TOP 20** (억원)")
-        top_buy = rank_df.nlargest(20, f"{inv}_num")
-        st.dataframe(_fmt_ranking(top_buy), use_container_width=True)
+        top_buy = df.loc[top_k_index(key, 20)]
+        st.dataframe(_fmt_ranking(top_buy), use_container_width=True,
+                     column_config=rank_col_config)
 
         # TOP 매도
         st.markdown(f"**{inv} 순매도 TOP 20** (억원)")
-        top_sell = rank_df.nsmallest(20, f"{inv}_num")
-        st.dataframe(_fmt_ranking(top_sell), use_container_width=True)
+        top_sell = df.loc[top_k_index(key, 20, largest=False)]
+        st.dataframe(_fmt_ranking(top_sell), use_container_width=True,
+                     column_config=rank_col_config)
@@ -2,28 +2,43 @@
 
 import os
 
+import numpy as np
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils import get_column_letter
+import xlsxwriter
 
 import config
 
 
-def _format_억(value):
-    """금액을 억원 단위로 변환 (콤마 포맷)."""
-    if not isinstance(value, (int, float)) or pd.isna(value):
-        return ""
-    return f"{round(float(value) / 1e8):,}"
+def _to_억_col(s: pd.Series) -> pd.Series:
+    """금액 컬럼을 억원 단위 숫자로 변환 (NaN은 빈 셀로 기록되도록 None).
 
-
-def _format_comma(value):
-    """숫자에 3자리 콤마 추가."""
-    if not isinstance(value, (int, float)) or pd.isna(value):
-        return ""
-    if isinstance(value, float) and value == int(value):
-        return f"{int(value):,}"
-    return f"{value:,}"
+    콤마 문자열로 바꾸지 않고 숫자를 유지한다 — 표시는 엑셀
+    number_format('#,##0')이 담당하고, 필터/정렬도 숫자로 동작한다.
+    """
+    num = (pd.to_numeric(s, errors="coerce") / 1e8).round()
+    if not num.hasnans:
+        # 일반적인 경우(수집 단계에서 이미 0으로 채워짐): 숫자 배열 그대로
+        return num
+    return num.astype(object).where(num.notna(), None)
+
+
+def _build_formats(book) -> dict:
+    """워크북 공유 포맷 생성 (xlsxwriter가 내부적으로 중복 제거·재사용)."""
+    return {
+        "title": book.add_format({"bold": True, "font_size": 14,
+                                  "align": "center"}),
+        "header": book.add_format({"bold": True, "font_size": 10,
+                                   "font_color": "#FFFFFF",
+                                   "bg_color": "#4472C4",
+                                   "align": "center"}),
+        "ticker": book.add_format({"num_format": "@"}),
+        "right": book.add_format({"align": "right"}),
+        "money": book.add_format({"num_format": "#,##0", "align": "right"}),
+        "pct": book.add_format({"num_format": "0.00", "align": "right"}),
+        # 조건부 서식용 (부호 색상 — 기본 서식 위에 폰트 색만 덧씌움)
+        "pos": book.add_format({"font_color": "#0000CC"}),
+        "neg": book.add_format({"font_color": "#CC0000"}),
+    }
 
 
 def save_to_excel(df: pd.DataFrame, date_str: str):
@@ -41,139 +56,101 @@ def save_to_excel(df: pd.DataFrame, date_str: str):
 
     file_path = os.path.join(config.DATA_DIR, f"수급_{date_str}.xlsx")
 
-    with pd.ExcelWriter(file_path, engine="openpyxl") as writer:
-        unit_note = "(단위: 억원)"
-
-        # 1) 전체 시트
-        _write_sheet(writer, df, "전체",
-                     f"투자자별 수급 현황 — {date_str} {unit_note}",
-                     config.COLUMN_ORDER)
-
-        # 2) 랭킹 시트 (외국인/기관/개인 TOP50)
-        for investor, sheet_name in config.RANKING_INVESTORS.items():
-            if investor not in df.columns:
-                continue
-            top_df = df.nlargest(50, investor).copy()
-            cols = config.RANKING_COLUMN_ORDER + [investor]
-            cols = [c for c in cols if c in top_df.columns]
-            _write_sheet(writer, top_df, sheet_name,
-                         f"{investor} 순매수 TOP 50 — {date_str} {unit_note}",
-                         cols)
-
-    # 스타일 적용
-    book = load_workbook(file_path)
-    for sheet_name in book.sheetnames:
-        _apply_styles(book, sheet_name)
-    book.save(file_path)
+    # 쓰기 전용 워크로드라 xlsxwriter + constant_memory 사용 —
+    # 행 단위로 바로 직렬화해 행 수와 무관하게 O(1) 메모리로 쓴다.
+    book = xlsxwriter.Workbook(file_path, {
+        "constant_memory": True,
+        "strings_to_numbers": False,
+        "nan_inf_to_errors": True,
+    })
+    fmts = _build_formats(book)
+
+    unit_note = "(단위: 억원)"
+
+    # 시트 사양을 먼저 수집해 시트 렌더링을 독립 작업 단위로 분리
+    sheets = [("전체",
+               f"투자자별 수급 현황 — {date_str} {unit_note}",
+               df, config.COLUMN_ORDER)]
+    for investor, sheet_name in config.RANKING_INVESTORS.items():
+        if investor not in df.columns:
+            continue
+        # 출력에 들어갈 컬럼만 추려 부분 정렬 — 안 쓸 컬럼 복사 방지
+        cols = config.RANKING_COLUMN_ORDER + [investor]
+        cols = [c for c in cols if c in df.columns]
+        top_df = df[cols].nlargest(50, investor)
+        sheets.append((sheet_name,
+                       f"{investor} 순매수 TOP 50 — {date_str} {unit_note}",
+                       top_df, cols))
+
+    for sheet_name, title, sheet_df, cols in sheets:
+        _write_sheet(book, fmts, sheet_df, sheet_name, title, cols)
+
+    book.close()
 
     print(f"[Excel] 저장 완료: {file_path}")
 
 
-def _write_sheet(writer, df: pd.DataFrame, sheet_name: str, title: str,
-                 columns: list):
+def _write_sheet(book, fmts: dict, df: pd.DataFrame, sheet_name: str,
+                 title: str, columns: list):
     """DataFrame을 시트에 기록 (1행 타이틀, 2행 헤더, 3행부터 데이터)."""
     cols = [c for c in columns if c in df.columns]
-    out_df = df[cols].copy()
-
-    # 금액 컬럼 → 억원 단위 (콤마)
-    money_cols = [c for c in cols if c in config.INVESTORS or c in ("시가총액", "거래대금")]
-    for col in money_cols:
-        if col in out_df.columns:
-            out_df[col] = out_df[col].apply(_format_억)
-
-    # 종가, 거래량 → 콤마만
-    for col in ["종가", "거래량"]:
-        if col in out_df.columns:
-            out_df[col] = out_df[col].apply(_format_comma)
-
-    # 티커를 문자열로 보장
-    if "티커" in out_df.columns:
-        out_df["티커"] = out_df["티커"].astype(str).str.zfill(6)
-
-    out_df.to_excel(writer, sheet_name=sheet_name, index=False, startrow=1)
-
-    # 타이틀 기록
-    ws = writer.sheets[sheet_name]
-    ws.cell(row=1, column=1, value=title)
-
-    # 티커 컬럼을 텍스트 포맷으로 설정 (선행 0 보존)
-    if "티커" in list(out_df.columns):
-        ticker_col_idx = list(out_df.columns).index("티커") + 1
-        for row_idx in range(3, ws.max_row + 1):
-            cell = ws.cell(row=row_idx, column=ticker_col_idx)
-            cell.number_format = "@"
-
-
-def _apply_styles(book, sheet_name: str):
-    """엑셀 시트에 스타일 적용."""
-    ws = book[sheet_name]
-    num_cols = ws.max_column
-
-    # 타이틀 행 (1행)
-    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=num_cols)
-    title_cell = ws.cell(row=1, column=1)
-    title_cell.font = Font(bold=True, size=14)
-    title_cell.alignment = Alignment(horizontal="center")
-
-    # 헤더 스타일 (2행)
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4",
-                              fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=10)
-
-    header_names = []
-    for col_idx in range(1, num_cols + 1):
-        cell = ws.cell(row=2, column=col_idx)
-        header_names.append(cell.value or "")
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center")
-
-    # 투자자 컬럼 인덱스 (조건부 서식용)
-    investor_col_indices = []
-    for col_idx, name in enumerate(header_names, 1):
-        if name in config.INVESTORS:
-            investor_col_indices.append(col_idx)
-
-    # 데이터 영역 스타일
-    blue_font = Font(color="0000CC")
-    red_font = Font(color="CC0000")
-
-    for row in ws.iter_rows(min_row=3, min_col=1, max_col=num_cols):
-        for cell in row:
-            # 숫자 정렬
-            if isinstance(cell.value, (int, float)):
-                cell.alignment = Alignment(horizontal="right")
-
-            # 투자자 컬럼 조건부 서식 (양수=파란, 음수=빨간)
-            if cell.column in investor_col_indices and cell.value:
-                val_str = str(cell.value)
-                if val_str.startswith("-"):
-                    cell.font = red_font
-                elif val_str not in ("0", ""):
-                    cell.font = blue_font
-
-    # 등락률 컬럼 색상
-    for col_idx, name in enumerate(header_names, 1):
-        if name == "등락률":
-            for row_idx in range(3, ws.max_row + 1):
-                cell = ws.cell(row=row_idx, column=col_idx)
-                if isinstance(cell.value, (int, float)):
-                    if cell.value > 0:
-                        cell.font = blue_font
-                    elif cell.value < 0:
-                        cell.font = red_font
-
-    # 열 너비 자동 조정
-    for col_idx in range(1, num_cols + 1):
-        max_len = len(str(header_names[col_idx - 1])) if col_idx <= len(header_names) else 5
-        for row in ws.iter_rows(min_row=3, min_col=col_idx, max_col=col_idx):
-            for cell in row:
-                if cell.value is not None:
-                    max_len = max(max_len, len(str(cell.value)))
-        ws.column_dimensions[get_column_letter(col_idx)].width = min(max_len + 3, 25)
-
-    # 자동 필터
-    ws.auto_filter.ref = f"A2:{get_column_letter(num_cols)}{ws.max_row}"
-
-    # 틀 고정 (A3)
-    ws.freeze_panes = "A3"
+
+    # 프레임 전체를 복사하지 않고 컬럼 단위로만 변환 —
+    # 손대는 컬럼(금액→억원, 티커→문자열)만 새 배열이 생긴다
+    out_cols = []
+    for name in cols:
+        s = df[name]
+        if name in config.INVESTORS or name in ("시가총액", "거래대금"):
+            s = _to_억_col(s)
+        elif name == "티커":
+            # 티커를 문자열로 보장 (선행 0 보존) — pandas StringMethods의
+            # 행별 디스패치 대신 numpy의 C 레벨 zfill 한 번으로 처리
+            s = pd.Series(np.char.zfill(s.to_numpy().astype(str), 6))
+        out_cols.append(s)
+
+    n_rows = len(df)
+    n_cols = len(cols)
+    ws = book.add_worksheet(sheet_name)
+
+    # 열 너비 + 열 기본 서식 — 셀 단위 스타일 대신 set_column 한 번씩
+    for idx, (name, s) in enumerate(zip(cols, out_cols)):
+        if name == "티커":
+            fmt = fmts["ticker"]
+        elif name in config.INVESTORS or name in ("시가총액", "거래대금",
+                                                  "종가", "거래량"):
+            fmt = fmts["money"]
+        elif name == "등락률":
+            fmt = fmts["pct"]
+        elif name in ("종목명", "시장"):
+            fmt = None
+        else:  # 회전율 등 기타 숫자 컬럼
+            fmt = fmts["right"]
+        col_width = int(s.astype(str).str.len().max()) if n_rows else 0
+        width = min(max(len(str(name)), col_width) + 3, 25)
+        ws.set_column(idx, idx, width, fmt)
+
+    # 1행 타이틀(병합) + 2행 헤더
+    ws.merge_range(0, 0, 0, n_cols - 1, title, fmts["title"])
+    ws.write_row(1, 0, cols, fmts["header"])
+
+    # 데이터 행 스트리밍 (constant_memory 모드: 행 순서대로만 기록) —
+    # 컬럼 배열들을 zip으로 묶어 중간 프레임 없이 행 단위로 흘려보낸다
+    arrays = [s.to_numpy() for s in out_cols]
+    for r, row in enumerate(zip(*arrays), 2):
+        ws.write_row(r, 0, row)
+
+    # 부호 색상(양수=파란, 음수=빨간)은 셀 단위 서식 대신 조건부 서식으로 —
+    # 열당 규칙 2개만 기록되고, 판정은 엑셀이 표시 시점에 한다.
+    first_row, last_row = 2, n_rows + 1
+    for idx, name in enumerate(cols):
+        if name in config.INVESTORS or name == "등락률":
+            ws.conditional_format(first_row, idx, last_row, idx,
+                                  {"type": "cell", "criteria": ">",
+                                   "value": 0, "format": fmts["pos"]})
+            ws.conditional_format(first_row, idx, last_row, idx,
+                                  {"type": "cell", "criteria": "<",
+                                   "value": 0, "format": fmts["neg"]})
+
+    # 자동 필터 + 틀 고정 (A3)
+    ws.autofilter(1, 0, n_rows + 1, n_cols - 1)
+    ws.freeze_panes(2, 0)
@@ -8,6 +8,7 @@ from __future__ import annotations
 
 import os
 import requests
+from requests.adapters import HTTPAdapter
 from pykrx.website.comm.webio import Post
 
 _session: requests.Session | None = None
@@ -16,6 +17,8 @@ _session: requests.Session | None = None
 def _create_authenticated_session(krx_id: str, krx_pw: str) -> requests.Session:
     """KRX 로그인 후 인증된 세션 반환."""
     session = requests.Session()
+    # 연결 풀링 (요청마다 TLS 핸드셰이크 반복 방지)
+    session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
     session.headers.update({
         "User-Agent": (
             "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "